@@ -1,9 +1,106 @@
-import requests
+import asyncio
+import aiohttp
+import ijson
+from aiolimiter import AsyncLimiter
+from cachetools import TLRUCache
 import sqlite3
-import time
+from concurrent.futures import ThreadPoolExecutor
 import json
+import logging
+import math
 import os
-from datetime import datetime
+import time
+from collections import OrderedDict
+
+try:
+    import orjson as fast_json
+except ImportError:  # orjson is an optional speedup; stdlib json covers the loads/dumps calls used here.
+    fast_json = json
+
+logger = logging.getLogger("dexbot")
+
+# Insert statements are module constants so sqlite3's statement cache, keyed by
+# SQL text, reuses the prepared statements on every batch.
+_SQL_INSERT_TOKEN = '''
+    INSERT INTO token_data (token_address, symbol, developer, contract, price, liquidity, volume, price_change, bundled, fetched_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+'''
+_SQL_INSERT_EVENT = '''
+    INSERT INTO coin_events (token_address, event_type_id, details, event_time)
+    VALUES (?, ?, ?, ?)
+'''
+
+# Retry policy for API calls: attempts after the first, base backoff in seconds,
+# and the HTTP statuses worth retrying.
+_HTTP_RETRIES = 3
+_HTTP_BACKOFF = 0.2
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# A failed POST may still have been processed, so other methods are only retried
+# when the server certainly did nothing: throttled, or never connected to.
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+_NON_IDEMPOTENT_RETRY_STATUSES = frozenset({429})
+# Upper bound, in seconds, on how long a server's Retry-After header can stall a request.
+_MAX_RETRY_AFTER = 30
+
+# How long a rugcheck verdict is trusted: 'Good' verdicts for an hour, anything else
+# (bad status or a failed lookup) only briefly so it is re-checked soon.
+_RUGCHECK_GOOD_TTL = 3600
+_RUGCHECK_RETRY_TTL = 60
+
+# How many tokens' last-snapshot hashes to remember (least recently seen are evicted).
+_MAX_SNAPSHOT_HASHES = 100_000
+
+# Event types classify_coin can emit; seeded into the event_types lookup table.
+_EVENT_TYPES = ("rugged", "pumped", "tier-1", "listed_on_cex")
+
+# Tokens that are typically listed on major centralized exchanges.
+_CEX_TOKENS = frozenset({"BTC", "ETH", "BNB", "USDT", "USDC"})
+
+# Notifications queued within this many seconds of each other are sent as one message.
+_TELEGRAM_COALESCE_WINDOW = 0.25
+# Telegram rejects messages longer than this many characters.
+_TELEGRAM_MAX_LENGTH = 4096
+
+# Most rows the database writer commits in one transaction.
+_DB_BATCH_SIZE = 500
+
+def _safe_float(value, _numeric_types=(int, float)):
+    """
+    Convert a value to a float safely. Return None if conversion fails.
+    None and plain numbers, the common cases, skip the exception handler.
+    """
+    if value is None:
+        return None
+    if type(value) in _numeric_types:
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class TokenRecord:
+    """
+    A token profile normalized once per cycle. Numeric fields are already coerced
+    to float (or None) and the symbol is upper-cased once for blacklist/CEX checks
+    and messages, so downstream code reads attributes instead of repeating dict
+    lookups and conversions.
+    """
+    __slots__ = ("token_address", "symbol", "symbol_upper", "developer", "contract",
+                 "price", "liquidity", "volume", "price_change", "bundled")
+
+    def __init__(self, token_address, symbol, developer, contract, price,
+                 liquidity, volume, price_change, bundled):
+        self.token_address = token_address
+        self.symbol = symbol
+        self.symbol_upper = symbol.upper()
+        self.developer = developer
+        self.contract = contract
+        self.price = price
+        self.liquidity = liquidity
+        self.volume = volume
+        self.price_change = price_change
+        self.bundled = bundled
 
 class DexScreenerBot:
     def __init__(self, db_path="dexscreener.db", config_path="config.json"):
@@ -14,25 +111,122 @@ class DexScreenerBot:
         self.db_path = db_path
         self.config_path = config_path
         self.config = self.load_config()
-        self.conn = sqlite3.connect(self.db_path)
+        self._refresh_blacklists()
+        self._refresh_thresholds()
+        self._refresh_endpoints()
+        # Writes run on the single sqlite-writer thread, so the connection must be usable off the main thread.
+        self.conn = sqlite3.connect(self.db_path, cached_statements=256, check_same_thread=False)
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self.configure_connection()
         self.create_tables()
+        # event type name -> event_types.id, written to coin_events instead of the name.
+        self._event_type_id = dict(self.conn.execute("SELECT name, id FROM event_types"))
+        # ("token" | "event", row) pairs waiting for the database writer task.
+        self._db_queue = asyncio.Queue()
+        self._db_task = None
+        # token_address -> hash of the last snapshot queued for it, in LRU order.
+        self._last_snapshot = OrderedDict()
+        self._cycle_ts = int(time.time())
+        self._etag = None
+        self._last_modified = None
+        # Set when a rugcheck lookup in the current cycle failed, see analyze_tokens.
+        self._rugcheck_failed = False
+        self.session = None
+        self._notify_queue = asyncio.Queue()
+        self._notify_task = None
+        self._notify_sends = set()
+        self._telegram_limiter = AsyncLimiter(30, 1)
+        # Bound rugcheck.xyz traffic: at most rugcheck_concurrency requests in flight,
+        # started at no more than rugcheck_rate per second.
+        filters = self.config.get("filters", {})
+        concurrency = filters.get("rugcheck_concurrency", 10)
+        if not isinstance(concurrency, int) or concurrency < 1:
+            logger.warning("Invalid rugcheck_concurrency %r; using 10.", concurrency)
+            concurrency = 10
+        rate = _safe_float(filters.get("rugcheck_rate", 5))
+        if rate is None or not math.isfinite(rate) or rate <= 0:
+            logger.warning("Invalid rugcheck_rate %r; using 5.", filters.get("rugcheck_rate"))
+            rate = 5
+        self._rug_semaphore = asyncio.Semaphore(concurrency)
+        # AsyncLimiter cannot hand out a fraction of a request, so rates below one
+        # per second become one request per 1/rate seconds.
+        self._rug_limiter = AsyncLimiter(rate, 1) if rate >= 1 else AsyncLimiter(1, 1 / rate)
+        # rugcheck verdicts keyed by contract; a contract's status rarely changes between polls.
+        # Entries are (verdict, expires_at) with wall-clock expiry, so they survive a restart
+        # via the JSON file written next to the database.
+        self._rug_cache = TLRUCache(maxsize=10_000, ttu=lambda _contract, entry, _now: entry[1], timer=time.time)
+        self._rug_cache_path = f"{self.db_path}.rugcheck.json"
+        self._rug_cache_dirty = False
+        self._load_rug_cache()
+
+    async def __aenter__(self):
+        """
+        Open the shared HTTP session and start the Telegram notification and
+        database writer tasks.
+        A single ClientSession keeps connections alive across requests and polling
+        cycles instead of re-dialing each time.
+        """
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=16, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+        self._notify_task = asyncio.create_task(self._notify_worker())
+        self._db_task = asyncio.create_task(self._db_writer())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """
+        Release the bot's resources; see close().
+        """
+        await self.close()
+
+    async def close(self):
+        """
+        Give queued notifications a chance to go out, then stop the worker, close
+        the shared HTTP session, write every queued row, wait for the sqlite-writer
+        thread to finish and close the database. Use this when the bot is not driven by `async with`.
+        """
+        if self._notify_task is not None:
+            try:
+                await asyncio.wait_for(self._notify_queue.join(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning("Dropping %s undelivered Telegram notifications.", self._notify_queue.qsize())
+            self._notify_task.cancel()
+            self._notify_task = None
+            for task in list(self._notify_sends):
+                task.cancel()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self._db_task is not None:
+            try:
+                await asyncio.wait_for(self._db_queue.join(), timeout=30)
+            except asyncio.TimeoutError:
+                logger.warning("Dropping %s unwritten database rows.", self._db_queue.qsize())
+            self._db_task.cancel()
+            self._db_task = None
+        self._db_executor.shutdown(wait=True)
+        self.conn.close()
     
     def load_config(self):
         """
         Load configuration from a JSON file. If not found, use default settings.
         The config should include:
-          - filters (e.g. rug_threshold, pump_threshold, tier1_liquidity)
+          - filters (e.g. rug_threshold, pump_threshold, tier1_liquidity, and
+            rugcheck_concurrency / rugcheck_rate to bound rugcheck.xyz traffic)
           - coin_blacklist and dev_blacklist (lists of symbols/developer addresses)
           - telegram (telegram_token and telegram_chat_id for notifications)
           - api_endpoints for rugcheck.xyz (Pocket Universe verification has been removed)
         """
         if not os.path.exists(self.config_path):
-            print(f"[{datetime.now()}] Config file {self.config_path} not found. Using default settings.")
+            logger.warning("Config file %s not found. Using default settings.", self.config_path)
             default_config = {
                 "filters": {
                     "rug_threshold": -80,
                     "pump_threshold": 100,
-                    "tier1_liquidity": 1000000
+                    "tier1_liquidity": 1000000,
+                    "rugcheck_concurrency": 10,
+                    "rugcheck_rate": 5
                 },
                 "coin_blacklist": [],
                 "dev_blacklist": [],
@@ -46,21 +240,76 @@ class DexScreenerBot:
             }
             return default_config
         else:
-            with open(self.config_path, "r") as f:
-                config = json.load(f)
-                print(f"[{datetime.now()}] Loaded configuration from {self.config_path}.")
+            with open(self.config_path, "rb") as f:
+                config = fast_json.loads(f.read())
+                logger.info("Loaded configuration from %s.", self.config_path)
                 return config
     
+    def _refresh_blacklists(self):
+        """
+        Build the case-normalized blacklist sets from the current config. Call again
+        whenever the config is reloaded; analyze_tokens only does membership tests.
+        """
+        self._coin_blacklist = frozenset(symbol.upper() for symbol in self.config.get("coin_blacklist", []))
+        self._dev_blacklist = frozenset(addr.lower() for addr in self.config.get("dev_blacklist", []))
+
+    def _refresh_thresholds(self):
+        """
+        Resolve the classification thresholds from the current config once, so the
+        per-token checks are plain attribute reads and comparisons.
+        """
+        filters = self.config.get("filters", {})
+        self._rug_threshold = filters.get("rug_threshold", -80)
+        self._pump_threshold = filters.get("pump_threshold", 100)
+        self._tier1_liquidity = filters.get("tier1_liquidity", 1000000)
+
+    def _refresh_endpoints(self):
+        """
+        Resolve the rugcheck endpoint and the Telegram sendMessage URL and chat id
+        from the current config once. The Telegram URL is None when no bot token
+        is configured.
+        """
+        self._rugcheck_endpoint = self.config.get("api_endpoints", {}).get("rugcheck", "")
+        telegram_config = self.config.get("telegram", {})
+        telegram_token = telegram_config.get("telegram_token", "")
+        self._telegram_url = f"https://api.telegram.org/bot{telegram_token}/sendMessage" if telegram_token else None
+        self._telegram_chat_id = telegram_config.get("telegram_chat_id", "")
+
+    def configure_connection(self):
+        """
+        Tune the SQLite connection for the insert-heavy polling loop:
+          - WAL journaling, so a commit is a single append instead of a rollback-journal copy.
+          - synchronous=NORMAL, so WAL commits skip the per-transaction fsync.
+          - A ~6 MB cap on the WAL file left behind after checkpoints.
+          - In-memory temp storage, a 256 MB mmap window and a 64 MB page cache.
+        Durability caveat: with synchronous=NORMAL the database stays consistent, but
+        the most recent transactions can be lost on an OS crash or power failure.
+        """
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA journal_size_limit=6144000")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self.conn.execute("PRAGMA cache_size=-64000")
+    
     def create_tables(self):
         """
         Create database tables:
           - token_data: Stores token snapshots.
           - coin_events: Logs detected events for each token.
+          - event_types: Lookup table of event names; coin_events stores the
+            small integer id instead of repeating the name on every row.
+        Both tables are indexed by token address and timestamp so per-token history
+        lookups do not scan the whole table, and by timestamp alone for time-range
+        queries across all tokens. On token_data the address/timestamp index is
+        unique, so a snapshot written twice for the same cycle is dropped by SQLite.
+        Timestamps are stored as integer Unix epoch seconds; format them with
+        datetime.fromtimestamp when reading.
         """
         c = self.conn.cursor()
         c.execute('''
             CREATE TABLE IF NOT EXISTS token_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id INTEGER PRIMARY KEY,
                 token_address TEXT,
                 symbol TEXT,
                 developer TEXT,
@@ -70,151 +319,448 @@ class DexScreenerBot:
                 volume REAL,
                 price_change REAL,
                 bundled INTEGER,
-                fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                fetched_at INTEGER NOT NULL
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS event_types (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL
             )
         ''')
+        c.executemany("INSERT OR IGNORE INTO event_types (name) VALUES (?)", [(name,) for name in _EVENT_TYPES])
         c.execute('''
             CREATE TABLE IF NOT EXISTS coin_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id INTEGER PRIMARY KEY,
                 token_address TEXT,
-                event_type TEXT,
+                event_type_id INTEGER REFERENCES event_types(id),
                 details TEXT,
-                event_time DATETIME DEFAULT CURRENT_TIMESTAMP
+                event_time INTEGER NOT NULL
             )
         ''')
+        self._migrate_timestamps(c)
+        self._migrate_event_types(c)
+        self._create_snapshot_index(c)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_events_token ON coin_events(token_address, event_time DESC)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_token_data_fetched ON token_data(fetched_at)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_coin_events_time ON coin_events(event_time)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_coin_events_type ON coin_events(event_type_id, event_time)")
         self.conn.commit()
+
+    def _create_snapshot_index(self, c):
+        """
+        Create the unique (token_address, fetched_at) index that the token_data
+        insert's ON CONFLICT clause relies on; it also serves per-token history
+        lookups, replacing the plain idx_token_data_token index. On a database
+        that predates it, duplicate snapshots are deleted first, keeping the
+        earliest row of each. Rows without an address are left alone: the index
+        treats NULLs as distinct, so they never conflict.
+        """
+        exists = c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_token_snapshot'"
+        ).fetchone()
+        if exists:
+            return
+        removed = c.execute('''
+            DELETE FROM token_data WHERE token_address IS NOT NULL AND id NOT IN (
+                SELECT MIN(id) FROM token_data GROUP BY token_address, fetched_at
+            )
+        ''').rowcount
+        if removed:
+            logger.info("Removed %s duplicate token snapshots.", removed)
+        c.execute("CREATE UNIQUE INDEX uq_token_snapshot ON token_data(token_address, fetched_at)")
+        c.execute("DROP INDEX IF EXISTS idx_token_data_token")
+
+    def _migrate_timestamps(self, c):
+        """
+        Convert timestamps written before they became integers (CURRENT_TIMESTAMP
+        text, in UTC) to epoch seconds, so they sort and range-filter together with
+        newer rows. Runs once per database, tracked with PRAGMA user_version.
+        """
+        if c.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return
+        converted = c.execute('''
+            UPDATE token_data SET fetched_at = CAST(strftime('%s', fetched_at) AS INTEGER)
+            WHERE typeof(fetched_at) = 'text'
+        ''').rowcount
+        converted += c.execute('''
+            UPDATE coin_events SET event_time = CAST(strftime('%s', event_time) AS INTEGER)
+            WHERE typeof(event_time) = 'text'
+        ''').rowcount
+        c.execute("PRAGMA user_version = 1")
+        if converted:
+            logger.info("Converted %s legacy text timestamps to epoch seconds.", converted)
+
+    def _migrate_event_types(self, c):
+        """
+        Upgrade a coin_events table created before the event_types lookup existed:
+        add event_type_id, register any event names not seeded yet, point every
+        row at its name's id and clear the old text column to free its space.
+        """
+        columns = {row[1] for row in c.execute("PRAGMA table_info(coin_events)")}
+        if "event_type_id" in columns:
+            return
+        logger.info("Migrating coin_events.event_type to the event_types lookup table.")
+        c.execute("ALTER TABLE coin_events ADD COLUMN event_type_id INTEGER REFERENCES event_types(id)")
+        c.execute("INSERT OR IGNORE INTO event_types (name) SELECT DISTINCT event_type FROM coin_events WHERE event_type IS NOT NULL")
+        c.execute('''
+            UPDATE coin_events
+            SET event_type_id = (SELECT id FROM event_types WHERE name = coin_events.event_type),
+                event_type = NULL
+        ''')
     
-    def fetch_data(self):
+    async def fetch_data(self):
         """
-        Fetch token profile data from DexScreener using the new API endpoint.
+        Stream token profiles from DexScreener using the new API endpoint.
+        The response is a JSON array; ijson parses it incrementally off the socket,
+        so each token is yielded as soon as it has been read.
+        The request is conditional on the previous response's ETag/Last-Modified,
+        so an unchanged profile list comes back as an empty 304 and yields nothing.
         """
         url = "https://api.dexscreener.com/token-profiles/latest/v1"
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()  # Raise an exception for HTTP errors
-            data = response.json()
-            return data
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    logger.info("Token profiles unchanged since the last poll.")
+                    return
+                response.raise_for_status()  # Raise an exception for HTTP errors
+                async for token in ijson.items(response.content, "item", use_float=True):
+                    yield token
+                # Only remember the validators once the whole body has been consumed.
+                self._etag = response.headers.get("ETag")
+                self._last_modified = response.headers.get("Last-Modified")
         except Exception as e:
-            print(f"[{datetime.now()}] Error fetching data: {e}")
-            return None
+            logger.error("Error fetching data: %s", e)
 
-    def save_token_data(self, token):
+    async def _request_json(self, method, url, limiter=None, **kwargs):
+        """
+        Issue a request on the shared session and decode the JSON body.
+        Throttling responses, server errors and connection failures are retried with
+        exponential backoff, or after the server's Retry-After delay when it sends one;
+        the last failure is raised to the caller.
+        Non-idempotent requests (POST) are only retried on 429 and on failures to
+        connect, since a timed-out or 5xx POST may already have taken effect.
+        When a limiter is given, every attempt, retries included, takes from it.
         """
-        Save the token’s snapshot into the database.
+        idempotent = method in _IDEMPOTENT_METHODS
+        retry_statuses = _RETRY_STATUSES if idempotent else _NON_IDEMPOTENT_RETRY_STATUSES
+        for attempt in range(_HTTP_RETRIES + 1):
+            delay = _HTTP_BACKOFF * 2 ** attempt
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    if response.status not in retry_statuses or attempt == _HTTP_RETRIES:
+                        response.raise_for_status()
+                        return fast_json.loads(await response.read())
+                    retry_after = _safe_float(response.headers.get("Retry-After"))
+                    if retry_after is not None and math.isfinite(retry_after) and retry_after >= 0:
+                        delay = min(retry_after, _MAX_RETRY_AFTER)
+            except aiohttp.ClientConnectorError:
+                if attempt == _HTTP_RETRIES:
+                    raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == _HTTP_RETRIES or not idempotent:
+                    raise
+            await asyncio.sleep(delay)
+
+    def save_token_data(self, record):
+        """
+        Queue the token’s snapshot for the database writer, unless it is identical
+        to the last snapshot queued for the same token address.
         Note: Since the new API does not provide market data, fields like price, liquidity,
         volume, and price_change will likely be stored as None.
         """
-        c = self.conn.cursor()
-        c.execute('''
-            INSERT INTO token_data (token_address, symbol, developer, contract, price, liquidity, volume, price_change, bundled)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            token.get("tokenAddress"),
-            token.get("symbol") or token.get("tokenAddress") or "UNKNOWN",
-            token.get("developer"),
-            token.get("contract"),
-            self._safe_float(token.get("priceUsd")),        # Likely None
-            self._safe_float(token.get("liquidityUsd")),      # Likely None
-            self._safe_float(token.get("volumeUsd")),         # Likely None
-            self._safe_float(token.get("priceChange")),       # Likely None
-            1 if token.get("bundled", False) else 0
-        ))
-        self.conn.commit()
+        snapshot = (
+            record.symbol,
+            record.developer,
+            record.contract,
+            record.price,
+            record.liquidity,
+            record.volume,
+            record.price_change,
+            record.bundled
+        )
+        snapshot_hash = hash(snapshot)
+        last_hashes = self._last_snapshot
+        if last_hashes.get(record.token_address) == snapshot_hash:
+            last_hashes.move_to_end(record.token_address)
+            return
+        last_hashes[record.token_address] = snapshot_hash
+        last_hashes.move_to_end(record.token_address)
+        if len(last_hashes) > _MAX_SNAPSHOT_HASHES:
+            last_hashes.popitem(last=False)
+        self._db_queue.put_nowait(("token", (record.token_address,) + snapshot + (self._cycle_ts,)))
 
     def record_event(self, token_address, event_type, details):
         """
-        Record a detected event (e.g. 'rugged', 'pumped') in the database.
+        Queue a detected event (e.g. 'rugged', 'pumped') for the database writer.
         """
-        c = self.conn.cursor()
-        c.execute('''
-            INSERT INTO coin_events (token_address, event_type, details)
-            VALUES (?, ?, ?)
-        ''', (token_address, event_type, details))
-        self.conn.commit()
+        event_type_id = self._event_type_id[event_type]
+        self._db_queue.put_nowait(("event", (token_address, event_type_id, details, self._cycle_ts)))
 
-    def _safe_float(self, value):
+    async def _db_writer(self):
         """
-        Convert a value to a float safely. Return None if conversion fails.
+        Background task that owns all database writes. It waits for a row, takes
+        whatever else is already queued (up to _DB_BATCH_SIZE rows) and hands the
+        batch to the sqlite-writer thread. The single-worker executor serializes
+        writes, matching SQLite's single-writer model, and keeps the event loop free
+        while the transaction commits; rows queued meanwhile form the next batch.
+        A batch that fails to write is logged and dropped, so one bad row never
+        stops the writer.
         """
-        try:
-            return float(value)
-        except (TypeError, ValueError):
-            return None
+        queue = self._db_queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < _DB_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            token_rows = [row for kind, row in batch if kind == "token"]
+            event_rows = [row for kind, row in batch if kind == "event"]
+            try:
+                await loop.run_in_executor(self._db_executor, self._flush_batch, token_rows, event_rows)
+            except Exception as e:
+                logger.error("Error writing %s rows to the database: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
 
-    def verify_volume(self, token):
+    def _flush_batch(self, token_rows, event_rows):
+        """
+        Write token snapshots and events with executemany inside a single
+        transaction, so a batch costs one commit instead of one per row.
+        """
+        with self.conn:
+            self.conn.executemany(_SQL_INSERT_TOKEN, token_rows)
+            self.conn.executemany(_SQL_INSERT_EVENT, event_rows)
+
+    def _normalize_token(self, token):
+        """
+        Build a TokenRecord from a raw token profile. Every field is resolved here,
+        once, including the fallbacks between the current API's field names
+        (tokenAddress, priceUsd, ...) and the older plain ones (address, price, ...);
+        downstream code only reads attributes of the record.
+        """
+        g = token.get
+        sf = _safe_float
+        # Use tokenAddress as the unique identifier and fallback for symbol.
+        token_address = g("tokenAddress") or g("address")
+        return TokenRecord(
+            token_address=token_address,
+            symbol=g("symbol") or token_address or "UNKNOWN",
+            developer=g("developer"),
+            contract=g("contract"),
+            price=sf(g("priceUsd") or g("price")),
+            liquidity=sf(g("liquidityUsd") or g("liquidity")),
+            volume=sf(g("volumeUsd") or g("volume")),
+            price_change=sf(g("priceChange") or g("price_change")),
+            bundled=1 if g("bundled") else 0
+        )
+
+    def _prefilter(self, record):
+        """
+        Cheap local checks run before any network verification. Reject tokens that
+        cannot pass rugcheck (no contract), report no volume, or whose known market
+        data is nowhere near a rug, pump or tier-1 threshold. Tokens without market
+        data are let through, since there is nothing to judge them on, and so are
+        CEX-listed symbols, whose listed_on_cex event does not depend on market data.
+        """
+        if not record.contract:
+            return False
+        if record.symbol_upper in _CEX_TOKENS:
+            return True
+        if record.volume is not None and record.volume <= 0:
+            return False
+        if record.price_change is None and record.liquidity is None:
+            return True
+        
+        rug_threshold = self._rug_threshold
+        pump_threshold = self._pump_threshold
+        tier1_liquidity = self._tier1_liquidity
+        
+        if record.price_change is not None and (
+            record.price_change < rug_threshold or record.price_change > pump_threshold * 0.5
+        ):
+            return True
+        if record.liquidity is not None and record.liquidity > tier1_liquidity * 0.5:
+            return True
+        return False
+
+    async def verify_volume(self, record):
         """
         Verify the token's volume.
         Since the new API does not provide volume data, we simply return True.
         """
         return True
 
-    def verify_rugcheck(self, token):
+    async def verify_rugcheck(self, record):
         """
         Check the token’s contract on rugcheck.xyz.
-        Only tokens with a status of 'Good' are allowed.
+        Only tokens with a status of 'Good' are allowed. The prefilter has already
+        rejected tokens without a contract.
+        Verdicts are cached per contract: 'Good' for an hour, anything else for a
+        minute. Failed lookups are cached as None and flag the cycle as incomplete,
+        both when they happen and while their cache entry lasts.
         """
-        contract = token.get("contract")
-        if not contract:
-            print(f"[{datetime.now()}] No contract info for token {token.get('symbol') or token.get('tokenAddress')}, skipping rugcheck.")
-            return False
-        endpoint = self.config.get("api_endpoints", {}).get("rugcheck", "")
-        if not endpoint:
+        contract = record.contract
+        if not self._rugcheck_endpoint:
             return True
+        cached = self._rug_cache.get(contract)
+        if cached is not None:
+            if cached[0] is None:
+                self._rugcheck_failed = True
+            return bool(cached[0])
         try:
-            response = requests.get(f"{endpoint}?contract={contract}", timeout=10)
-            response.raise_for_status()
-            result = response.json()
+            async with self._rug_semaphore:
+                result = await self._request_json(
+                    "GET", self._rugcheck_endpoint, limiter=self._rug_limiter, params={"contract": contract}
+                )
             status = result.get("status", "")
             if status != "Good":
-                print(f"[{datetime.now()}] Token {token.get('symbol') or token.get('tokenAddress')} is marked as '{status}' on rugcheck.xyz.")
-            return status == "Good"
+                logger.info("Token %s is marked as '%s' on rugcheck.xyz.", record.symbol, status)
+            good = status == "Good"
         except Exception as e:
-            print(f"[{datetime.now()}] Error verifying rugcheck for token {token.get('symbol') or token.get('tokenAddress')}: {e}")
-            return False
+            logger.error("Error verifying rugcheck for token %s: %s", record.symbol, e)
+            good = None
+            self._rugcheck_failed = True
+        ttl = _RUGCHECK_GOOD_TTL if good else _RUGCHECK_RETRY_TTL
+        self._rug_cache[contract] = (good, time.time() + ttl)
+        self._rug_cache_dirty = True
+        return bool(good)
+
+    def _load_rug_cache(self):
+        """
+        Restore unexpired rugcheck verdicts saved by a previous run, so a restart
+        does not re-check every contract from scratch. The file maps each contract
+        to [verdict, expires_at]; one that cannot be read or has the wrong shape is
+        ignored.
+        """
+        if not os.path.exists(self._rug_cache_path):
+            return
+        try:
+            with open(self._rug_cache_path, "rb") as f:
+                entries = fast_json.loads(f.read())
+            now = time.time()
+            for contract, (good, expires_at) in entries.items():
+                if expires_at > now:
+                    self._rug_cache[contract] = (None if good is None else bool(good), float(expires_at))
+        except Exception as e:
+            logger.warning("Could not load rugcheck cache %s: %s", self._rug_cache_path, e)
+            return
+        logger.info("Loaded %s cached rugcheck verdicts.", len(self._rug_cache))
+
+    async def save_rug_cache(self):
+        """
+        Persist the rugcheck cache if it changed. The snapshot is taken on the event
+        loop; the file is written on the sqlite-writer thread.
+        """
+        if not self._rug_cache_dirty:
+            return
+        data = fast_json.dumps(dict(self._rug_cache))
+        if isinstance(data, str):  # stdlib json fallback
+            data = data.encode()
+        self._rug_cache_dirty = False
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._db_executor, self._write_rug_cache, data)
+
+    def _write_rug_cache(self, data):
+        """
+        Atomically replace the rugcheck cache file with the JSON snapshot.
+        """
+        tmp_path = self._rug_cache_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._rug_cache_path)
+        except OSError as e:
+            logger.warning("Could not save rugcheck cache %s: %s", self._rug_cache_path, e)
 
     def send_telegram_notification(self, message):
         """
-        Send a notification via Telegram.
+        Queue a notification for Telegram. The actual POST happens in the background
+        worker, so token analysis never waits on the Telegram API.
         """
-        telegram_config = self.config.get("telegram", {})
-        telegram_token = telegram_config.get("telegram_token", "")
-        chat_id = telegram_config.get("telegram_chat_id", "")
-        if not telegram_token or not chat_id:
-            print(f"[{datetime.now()}] Telegram configuration missing. Skipping Telegram notification.")
+        if not self._telegram_url or not self._telegram_chat_id:
+            logger.warning("Telegram configuration missing. Skipping Telegram notification.")
             return
-        url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
+        self._notify_queue.put_nowait(message)
+
+    async def _notify_worker(self):
+        """
+        Drain the notification queue. Messages that arrive within a short window of
+        each other are coalesced into as few Telegram messages as the length limit allows,
+        and each batch is sent in its own task so a slow POST never holds up the next one.
+        """
+        while True:
+            messages = [await self._notify_queue.get()]
+            await asyncio.sleep(_TELEGRAM_COALESCE_WINDOW)
+            while not self._notify_queue.empty():
+                messages.append(self._notify_queue.get_nowait())
+            task = asyncio.create_task(self._send_batch(messages))
+            self._notify_sends.add(task)
+            task.add_done_callback(self._notify_sends.discard)
+
+    async def _send_batch(self, messages):
+        """
+        Send a batch of queued messages concurrently, then mark them done on the queue.
+        """
+        try:
+            await asyncio.gather(*[self._post_telegram(text) for text in self._coalesce_messages(messages)])
+        finally:
+            for _ in messages:
+                self._notify_queue.task_done()
+
+    def _coalesce_messages(self, messages):
+        """
+        Join messages with blank lines, starting a new chunk whenever the next
+        message would push the current one past Telegram's length limit.
+        """
+        chunks = []
+        for message in messages:
+            if chunks and len(chunks[-1]) + 2 + len(message) <= _TELEGRAM_MAX_LENGTH:
+                chunks[-1] += "\n\n" + message
+            else:
+                chunks.append(message)
+        return chunks
+
+    async def _post_telegram(self, message):
+        """
+        Send a notification via Telegram, staying under the bot API's global
+        limit of 30 messages per second.
+        """
         payload = {
-            "chat_id": chat_id,
+            "chat_id": self._telegram_chat_id,
             "text": message
         }
         try:
-            response = requests.post(url, data=payload, timeout=10)
-            if response.status_code == 200:
-                print(f"[{datetime.now()}] Telegram notification sent.")
-            else:
-                print(f"[{datetime.now()}] Telegram notification failed with status code {response.status_code}.")
+            await self._request_json(
+                "POST", self._telegram_url, limiter=self._telegram_limiter,
+                data=fast_json.dumps(payload), headers={"Content-Type": "application/json"}
+            )
+            logger.info("Telegram notification sent.")
         except Exception as e:
-            print(f"[{datetime.now()}] Error sending Telegram notification: {e}")
+            logger.error("Error sending Telegram notification: %s", e)
 
-    def classify_coin(self, token):
+    def classify_coin(self, record):
         """
         Apply classification thresholds from the config to the token’s market metrics.
+        Returns (event_type, details) tuples; recording them is up to the caller.
         Since the new API does not provide market data, this method will likely return an empty list.
         """
         events = []
-        # Use tokenAddress as both the unique identifier and fallback for symbol.
-        token_address = token.get("tokenAddress")
-        symbol = token.get("symbol") or token_address or "UNKNOWN"
-        price_change = token.get("priceChange") or token.get("price_change")
-        liquidity = token.get("liquidityUsd") or token.get("liquidity")
+        symbol = record.symbol
         
-        filters = self.config.get("filters", {})
-        rug_threshold = filters.get("rug_threshold", -80)
-        pump_threshold = filters.get("pump_threshold", 100)
-        tier1_liquidity = filters.get("tier1_liquidity", 1000000)
+        rug_threshold = self._rug_threshold
+        pump_threshold = self._pump_threshold
+        tier1_liquidity = self._tier1_liquidity
         
-        price_change_val = self._safe_float(price_change)
-        liquidity_val = self._safe_float(liquidity)
+        price_change_val = record.price_change
+        liquidity_val = record.liquidity
         
         # If market data is not available, these values will be None and no events will be detected.
         if price_change_val is not None and price_change_val < rug_threshold:
@@ -224,82 +770,126 @@ class DexScreenerBot:
         if liquidity_val is not None and liquidity_val > tier1_liquidity:
             events.append(("tier-1", f"High liquidity of {liquidity_val} (threshold: {tier1_liquidity})"))
         
-        known_cex_tokens = {"BTC", "ETH", "BNB", "USDT", "USDC"}
-        if symbol and symbol.upper() in known_cex_tokens:
+        if record.symbol_upper in _CEX_TOKENS:
             events.append(("listed_on_cex", f"Token {symbol} is typically listed on major CEXs"))
         
-        for event_type, details in events:
-            self.record_event(token_address, event_type, details)
-            print(f"[{datetime.now()}] Detected event for {symbol} ({token_address}): {event_type} - {details}")
-            
         return events
 
-    def analyze_tokens(self, data):
+    async def analyze_tokens(self, tokens):
         """
         Process tokens from the Dexscreener API:
-          - Expecting data to be a list of token profiles.
-          - Filter tokens based on blacklists.
-          - Skip tokens with bundled supply.
+          - Expecting tokens to be an async iterable of token profiles (see fetch_data).
+          - As each token arrives, normalize it and run the local checks inline:
+            blacklists, bundled supply and the prefilter. Only survivors get a task.
           - Verify volume (always returns True) and rugcheck status.
           - Save data, classify events, and send trade notifications via Telegram.
+          - Snapshots and events are queued for the database writer task, which
+            commits them in batches off the event loop.
+          - If any rugcheck lookup failed, forget the list's ETag/Last-Modified so the
+            next poll fetches it in full and those tokens are checked again.
+        Returns the number of tokens processed.
         """
-        # If data is a list, use it directly; otherwise, try to extract tokens.
-        if isinstance(data, list):
-            tokens = data
-        else:
-            tokens = data.get("tokens", [])
-        print(f"[{datetime.now()}] Processing {len(tokens)} tokens...")
+        # One timestamp per cycle, shared by every snapshot and event it produces.
+        self._cycle_ts = int(time.time())
+        self._rugcheck_failed = False
+        received = 0
+        tasks = []
+        async for token in tokens:
+            received += 1
+            record = self._normalize_token(token)
+            if self._passes_local_checks(record):
+                tasks.append(asyncio.create_task(self._process_token(record)))
+        await asyncio.gather(*tasks)
+        if self._rugcheck_failed and (self._etag or self._last_modified):
+            logger.info("Some rugcheck lookups failed; the next poll will refetch the full token list.")
+            self._etag = None
+            self._last_modified = None
+        await self.save_rug_cache()
+        logger.info("Processed %s tokens (%s candidates).", received, len(tasks))
+        return received
+
+    def _passes_local_checks(self, record):
+        """
+        Run the checks that need no network: coin and developer blacklists, bundled
+        supply and the prefilter.
+        """
+        symbol = record.symbol_upper
+        developer = record.developer
         
-        coin_blacklist = set(symbol.upper() for symbol in self.config.get("coin_blacklist", []))
-        dev_blacklist = set(addr.lower() for addr in self.config.get("dev_blacklist", []))
+        if symbol in self._coin_blacklist:
+            logger.debug("Token %s is blacklisted. Skipping.", symbol)
+            return False
         
-        for token in tokens:
-            # Use tokenAddress as the unique identifier and fallback for symbol.
-            symbol = (token.get("symbol") or token.get("tokenAddress") or "").upper()
-            developer = token.get("developer", "")
-            bundled = token.get("bundled", False)
-            
-            if symbol in coin_blacklist:
-                print(f"[{datetime.now()}] Token {symbol} is blacklisted. Skipping.")
-                continue
-            
-            if developer and developer.lower() in dev_blacklist:
-                print(f"[{datetime.now()}] Token {symbol} is from a blacklisted developer ({developer}). Skipping.")
-                continue
-            
-            if bundled:
-                print(f"[{datetime.now()}] Token {symbol} has bundled supply. Skipping.")
-                continue
-            
-            if not self.verify_volume(token):
-                print(f"[{datetime.now()}] Token {symbol} failed volume check. Skipping.")
-                continue
-            
-            if not self.verify_rugcheck(token):
-                print(f"[{datetime.now()}] Token {symbol} failed rugcheck verification. Skipping.")
-                continue
-            
-            self.save_token_data(token)
-            events = self.classify_coin(token)
-            trade_signals = [e for e in events if e[0] in ("pumped", "tier-1")]
-            if trade_signals:
-                message = f"Trade Signal for {symbol}:\n" + "\n".join([f"{etype}: {detail}" for etype, detail in trade_signals])
-                self.send_telegram_notification(message)
-
-    def run(self, interval=60):
+        if developer and developer.lower() in self._dev_blacklist:
+            logger.debug("Token %s is from a blacklisted developer (%s). Skipping.", symbol, developer)
+            return False
+        
+        if record.bundled:
+            logger.debug("Token %s has bundled supply. Skipping.", symbol)
+            return False
+        
+        if not self._prefilter(record):
+            logger.debug("Token %s failed local prefilter. Skipping.", symbol)
+            return False
+        
+        return True
+
+    async def _process_token(self, record):
+        """
+        Verify, save and classify a single token that passed the local checks.
+        Called concurrently for every candidate in a batch by analyze_tokens.
+        """
+        symbol = record.symbol_upper
+        # The two verifications are independent, so run them concurrently.
+        volume_ok, rugcheck_ok = await asyncio.gather(
+            self.verify_volume(record),
+            self.verify_rugcheck(record)
+        )
+        
+        if not volume_ok:
+            logger.debug("Token %s failed volume check. Skipping.", symbol)
+            return
+        
+        if not rugcheck_ok:
+            logger.debug("Token %s failed rugcheck verification. Skipping.", symbol)
+            return
+        
+        self.save_token_data(record)
+        events = self.classify_coin(record)
+        for event_type, details in events:
+            self.record_event(record.token_address, event_type, details)
+            logger.info("Detected event for %s (%s): %s - %s", record.symbol, record.token_address, event_type, details)
+        trade_signals = [e for e in events if e[0] in ("pumped", "tier-1")]
+        if trade_signals:
+            message = f"Trade Signal for {symbol}:\n" + "\n".join([f"{etype}: {detail}" for etype, detail in trade_signals])
+            self.send_telegram_notification(message)
+
+    async def run(self, interval=60):
         """
         Main loop: fetch data from Dexscreener, analyze tokens, and wait for the next cycle.
+        Cycles start on a fixed cadence (every `interval` seconds on the monotonic clock)
+        regardless of how long each one takes. A cycle that overruns skips the ticks it
+        missed instead of starting the next ones back to back.
         """
-        print(f"[{datetime.now()}] DexScreenerBot is starting. Polling every {interval} seconds...")
+        logger.info("DexScreenerBot is starting. Polling every %s seconds...", interval)
+        next_tick = time.monotonic()
         while True:
-            data = self.fetch_data()
-            if data:
-                self.analyze_tokens(data)
-            else:
-                print(f"[{datetime.now()}] No data fetched; retrying in {interval} seconds.")
-            time.sleep(interval)
+            next_tick += interval
+            processed = await self.analyze_tokens(self.fetch_data())
+            if not processed:
+                logger.info("No new data fetched; retrying at the next tick.")
+            now = time.monotonic()
+            if now > next_tick:
+                missed = int((now - next_tick) // interval) + 1
+                logger.warning("Polling cycle took %.1f seconds, longer than the %s second interval; skipping %s tick(s).",
+                               now - next_tick + interval, interval, missed)
+                next_tick += missed * interval
+            await asyncio.sleep(next_tick - now)
+
+async def main():
+    async with DexScreenerBot() as bot:
+        await bot.run(interval=60)
 
 if __name__ == "__main__":
-    bot = DexScreenerBot()
-    bot.run(interval=60)
-    
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(main())